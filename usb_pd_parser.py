@@ -5,79 +5,178 @@ A clean, object-oriented PDF parser for USB Power Delivery specifications.
 """
 
 import argparse
+import hashlib
+import json
 import logging
 import sys
 import os
-from datetime import datetime
-from src.parser import PDFParser
-from src.output import OutputManager
-from src.validator import ValidationManager
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
-# Configure logging
+# Configure logging; piped runs keep stdout for the JSON summary line
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
+    handlers=[logging.StreamHandler(sys.stdout if sys.stdout.isatty() else sys.stderr)]
 )
 logger = logging.getLogger(__name__)
 
+# Parsed results are cached here, keyed by the PDF's content hash and parser source
+CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'usb_pd_parser'
+)
+
+# Bump when the cache file layout changes; parser edits are picked up automatically
+CACHE_VERSION = 2
+
+
+class Reporter:
+    """Console progress output; piped runs get one JSON summary line instead."""
+    
+    def __init__(self, stream=None):
+        """Initialize the reporter for a single run."""
+        self.stream = stream or sys.stdout
+        self.interactive = self.stream.isatty()
+        self.start_time = time.perf_counter()
+    
+    def step(self, message):
+        """Show a progress message on interactive terminals only."""
+        if self.interactive:
+            self.stream.write(f"{message}\n")
+    
+    def error(self, message, **summary):
+        """Finish a failed run; piped runs send the message to stderr and print a summary."""
+        if self.interactive:
+            self.stream.write(f"{message}\n")
+            self.stream.flush()
+        else:
+            sys.stderr.write(f"{message}\n")
+            self._write_summary(summary)
+    
+    def done(self, message, **summary):
+        """Finish the run with a message, or a JSON summary line when piped."""
+        if self.interactive:
+            self.stream.write(f"{message}\n")
+            self.stream.flush()
+        else:
+            self._write_summary(summary)
+    
+    def _write_summary(self, summary):
+        """Write the run summary as a single JSON line."""
+        summary['elapsed_s'] = round(time.perf_counter() - self.start_time, 3)
+        self.stream.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
 
 class USBPDParserApp:
     """Main application class for USB PD parsing."""
     
-    def __init__(self, output_dir="output"):
+    def __init__(self, output_dir="output", strict_validation=False, use_cache=True,
+                 compress=False, validation_report=True, report_format='xlsx'):
         """Initialize the parser application."""
+        # Imported here so --help and argument errors skip pdfplumber/pandas
+        from src.parser import PDFParser
+        from src.output import OutputManager
+        from src.validator import ValidationManager
+        
         self.output_dir = output_dir
+        self.strict_validation = strict_validation
+        self.use_cache = use_cache
+        self.validation_report = validation_report
         self.parser = PDFParser()
-        self.output_manager = OutputManager(output_dir)
+        self.output_manager = OutputManager(
+            output_dir, compress=compress, report_format=report_format
+        )
         self.validator = ValidationManager()
-        
-        # Create output directory
-        os.makedirs(output_dir, exist_ok=True)
     
     def parse_pdf(self, pdf_path, verbose=False):
         """Parse a PDF file and generate all outputs."""
+        reporter = Reporter()
         try:
             if verbose:
                 logging.getLogger().setLevel(logging.DEBUG)
             
             logger.info("Starting USB PD Specification parsing...")
-            print(f"🔍 Parsing: {pdf_path}")
+            reporter.step(f"🔍 Parsing: {pdf_path}")
             
-            # Parse PDF
-            if not self.parser.load_pdf(pdf_path):
-                print("❌ Failed to load PDF file")
-                return False
+            cache_path = self._cache_path(pdf_path) if self.use_cache else None
+            cached = self._load_cached_parse(cache_path) if cache_path else None
             
-            # Extract content
-            doc_title = self.parser.extract_title()
-            toc_entries = self.parser.extract_toc()
-            sections = self.parser.extract_sections()
-            metadata = self.parser.generate_metadata()
+            if cached:
+                doc_title, toc_entries, sections, metadata = cached
+                reporter.step("♻️  Using cached parse results")
+            else:
+                # Parse PDF
+                if not self.parser.load_pdf(pdf_path):
+                    reporter.error(
+                        "❌ Failed to load PDF file",
+                        pdf=pdf_path,
+                        output_dir=self.output_dir,
+                        validation='ERROR',
+                        error="Failed to load PDF file"
+                    )
+                    return False
+                
+                # Extract content
+                doc_title = self.parser.extract_title()
+                toc_entries = self.parser.extract_toc()
+                sections = self.parser.extract_sections()
+                metadata = self.parser.generate_metadata()
+                
+                # Extraction returns empty metadata after an error; don't cache that
+                if cache_path and metadata:
+                    self._store_cached_parse(
+                        cache_path, (doc_title, toc_entries, sections, metadata)
+                    )
             
-            print(f"✅ Extracted {len(toc_entries)} ToC entries and {len(sections)} sections")
+            reporter.step(
+                f"✅ Extracted {len(toc_entries)} ToC entries and {len(sections)} sections"
+            )
             
             # Generate outputs
-            self.output_manager.generate_toc_file(toc_entries, doc_title)
-            self.output_manager.generate_spec_file(sections, doc_title)
-            self.output_manager.generate_metadata_file(metadata)
-            self.output_manager.generate_validation_report(toc_entries, sections, metadata)
+            self._generate_outputs(toc_entries, sections, metadata, doc_title)
             
             # Validate outputs
-            validation_result = self.validator.validate_outputs(self.output_dir)
+            validation_result = self.validator.validate_outputs(
+                self.output_dir, strict=self.strict_validation,
+                report_file=(
+                    self.output_manager.report_filename()
+                    if self._writes_report(toc_entries, sections) else None
+                ),
+                compress=self.output_manager.compress
+            )
             
-            print(f"✅ All outputs generated in: {self.output_dir}")
-            print(f"📊 Validation: {'PASS' if validation_result else 'FAIL'}")
+            validation_status = 'PASS' if validation_result else 'FAIL'
+            reporter.step(f"✅ All outputs generated in: {self.output_dir}")
+            reporter.done(
+                f"📊 Validation: {validation_status}",
+                pdf=pdf_path,
+                toc_entries=len(toc_entries),
+                sections=len(sections),
+                output_dir=self.output_dir,
+                validation=validation_status
+            )
             
             return True
             
         except Exception as e:
-            logger.error(f"Parsing failed: {e}")
-            print(f"❌ Error: {e}")
+            logger.error("Parsing failed: %s", e)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.exception("Full traceback:")
+            reporter.error(
+                f"❌ Error: {e}",
+                pdf=pdf_path,
+                output_dir=self.output_dir,
+                validation='ERROR',
+                error=str(e)
+            )
             return False
     
     def generate_samples(self):
         """Generate sample output files for demonstration."""
+        reporter = Reporter()
         try:
             logger.info("Generating sample outputs...")
             
@@ -85,23 +184,113 @@ class USBPDParserApp:
             sample_data = self._create_sample_data()
             
             # Generate sample files
-            self.output_manager.generate_toc_file(sample_data['toc'], sample_data['title'])
-            self.output_manager.generate_spec_file(sample_data['sections'], sample_data['title'])
-            self.output_manager.generate_metadata_file(sample_data['metadata'])
-            self.output_manager.generate_validation_report(
-                sample_data['toc'], 
-                sample_data['sections'], 
-                sample_data['metadata']
+            self._generate_outputs(
+                sample_data['toc'],
+                sample_data['sections'],
+                sample_data['metadata'],
+                sample_data['title']
             )
             
-            print(f"✅ Sample files generated in: {self.output_dir}")
+            reporter.done(
+                f"✅ Sample files generated in: {self.output_dir}",
+                samples=True,
+                output_dir=self.output_dir
+            )
             return True
             
         except Exception as e:
-            logger.error(f"Sample generation failed: {e}")
-            print(f"❌ Error: {e}")
+            logger.error("Sample generation failed: %s", e)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.exception("Full traceback:")
+            reporter.error(
+                f"❌ Error: {e}",
+                samples=True,
+                output_dir=self.output_dir,
+                validation='ERROR',
+                error=str(e)
+            )
             return False
     
+    def _parser_fingerprint(self):
+        """Return a hash of the parser source, so editing it invalidates the cache."""
+        with open(sys.modules[type(self.parser).__module__].__file__, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    
+    def _cache_path(self, pdf_path):
+        """Return the cache file for a PDF, keyed by its content hash and the parser."""
+        with open(pdf_path, 'rb') as f:
+            if hasattr(hashlib, 'file_digest'):
+                # Python 3.11+: hashes through a reusable buffer without Python-level reads
+                digest = hashlib.file_digest(f, 'sha256')
+            else:
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        return os.path.join(
+            CACHE_DIR, f"{digest.hexdigest()[:32]}-{self._parser_fingerprint()}.json"
+        )
+    
+    def _load_cached_parse(self, cache_path):
+        """Load cached parse results, or return None on a miss."""
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            version = entry['version']
+            doc_title, toc_entries, sections, metadata = entry['results']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Ignoring unreadable cache file %s: %s", cache_path, e)
+            return None
+        
+        if version != CACHE_VERSION:
+            logger.info("Ignoring cache file from an older version: %s", cache_path)
+            return None
+        
+        logger.info("Loaded cached parse results: %s", cache_path)
+        return doc_title, toc_entries, sections, metadata
+    
+    def _store_cached_parse(self, cache_path, results):
+        """Store parse results in the cache; failures only log a warning."""
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            
+            # Write to a temporary file first so readers never see a partial entry
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'results': results}, f, ensure_ascii=False)
+            os.replace(temp_path, cache_path)
+            
+            logger.info("Cached parse results: %s", cache_path)
+        except Exception as e:
+            logger.warning("Could not write cache file %s: %s", cache_path, e)
+    
+    def _writes_report(self, toc_entries, sections):
+        """Return whether a validation report is generated for these results."""
+        # A report with nothing in it would only be misleading
+        return self.validation_report and bool(toc_entries or sections)
+    
+    def _generate_outputs(self, toc_entries, sections, metadata, doc_title):
+        """Generate all output files concurrently."""
+        # Each generator writes its own file, so they can run side by side
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [
+                executor.submit(self.output_manager.generate_toc_file, toc_entries, doc_title),
+                executor.submit(self.output_manager.generate_spec_file, sections, doc_title),
+                executor.submit(self.output_manager.generate_metadata_file, metadata)
+            ]
+            
+            # The validation report is the slowest output and can be skipped
+            if self._writes_report(toc_entries, sections):
+                futures.append(executor.submit(
+                    self.output_manager.generate_validation_report,
+                    toc_entries, sections, metadata
+                ))
+            elif self.validation_report:
+                logger.info("Skipping validation report (no content)")
+            
+            return [future.result() for future in futures]
+    
     def _create_sample_data(self):
         """Create sample data for demonstration."""
         return {
@@ -153,11 +342,23 @@ class USBPDParserApp:
                 "total_tables": 0,
                 "total_figures": 0,
                 "max_level": 3,
-                "parsing_timestamp": datetime.now().isoformat()
+                "parsing_timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds')
             }
         }
 
 
+def _create_app(args):
+    """Build the application from parsed command-line arguments."""
+    return USBPDParserApp(
+        args.output_dir,
+        strict_validation=args.strict_validation,
+        use_cache=not args.no_cache,
+        compress=args.compress,
+        validation_report=not args.skip_validation_report,
+        report_format=args.report_format
+    )
+
+
 def main():
     """Main entry point."""
     parser = argparse.ArgumentParser(
@@ -168,6 +369,10 @@ Examples:
   python usb_pd_parser.py -i "spec.pdf"          # Parse PDF
   python usb_pd_parser.py -i "spec.pdf" -o "out" # Custom output dir
   python usb_pd_parser.py -i "spec.pdf" --verbose # Verbose logging
+  python usb_pd_parser.py -i "spec.pdf" --no-cache # Always re-parse the PDF
+  python usb_pd_parser.py -i "spec.pdf" --compress # Write .jsonl.gz files
+  python usb_pd_parser.py -i "spec.pdf" --skip-validation-report # JSONL only
+  python usb_pd_parser.py -i "spec.pdf" --report-format csv # CSV report
   python usb_pd_parser.py --samples               # Generate samples
         """
     )
@@ -189,6 +394,37 @@ Examples:
         help='Generate sample output files'
     )
     
+    parser.add_argument(
+        '--strict-validation',
+        action='store_true',
+        help='Schema-check every output record instead of a sample'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help=f'Re-parse the PDF instead of reusing cached results from {CACHE_DIR}'
+    )
+    
+    parser.add_argument(
+        '--compress',
+        action='store_true',
+        help='Write gzip-compressed JSONL files (.jsonl.gz)'
+    )
+    
+    parser.add_argument(
+        '--skip-validation-report',
+        action='store_true',
+        help='Do not generate the validation report'
+    )
+    
+    parser.add_argument(
+        '--report-format',
+        choices=['xlsx', 'csv'],
+        default='xlsx',
+        help='Validation report format; csv writes one file per sheet (default: xlsx)'
+    )
+    
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
@@ -197,25 +433,32 @@ Examples:
     
     args = parser.parse_args()
     
-    # Initialize application
-    app = USBPDParserApp(args.output_dir)
-    
     if args.samples:
         # Generate sample files
-        success = app.generate_samples()
+        success = _create_app(args).generate_samples()
         sys.exit(0 if success else 1)
     
     elif args.input:
         # Parse PDF file
         if not os.path.exists(args.input):
-            print(f"❌ File not found: {args.input}")
+            Reporter().error(
+                f"❌ File not found: {args.input}",
+                pdf=args.input,
+                validation='ERROR',
+                error="File not found"
+            )
             sys.exit(1)
         
         if not args.input.lower().endswith('.pdf'):
-            print(f"❌ File must be a PDF: {args.input}")
+            Reporter().error(
+                f"❌ File must be a PDF: {args.input}",
+                pdf=args.input,
+                validation='ERROR',
+                error="File must be a PDF"
+            )
             sys.exit(1)
         
-        success = app.parse_pdf(args.input, args.verbose)
+        success = _create_app(args).parse_pdf(args.input, args.verbose)
         sys.exit(0 if success else 1)
     
     else: